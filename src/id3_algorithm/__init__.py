@@ -1,10 +1,14 @@
 """Core package exposing helpers to train ID3 decision trees."""
 
-from . import cli, entropy, variance, tree
+from . import bitset, cli, data, entropy, pruning, split, variance, tree
 
 __all__ = [
+    "bitset",
     "cli",
+    "data",
     "entropy",
+    "pruning",
+    "split",
     "variance",
     "tree",
 ]
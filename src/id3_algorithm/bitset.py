@@ -0,0 +1,61 @@
+"""Helpers for storing binary columns as packed ``uint64`` bitsets."""
+
+from __future__ import annotations
+
+import numpy as np
+from numba import njit
+
+
+WORD_BITS = 64
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def pack_columns(matrix: np.ndarray) -> np.ndarray:
+    """Pack the 0/1 columns of ``matrix`` into a ``(columns, words)`` bitset array.
+
+    Row ``r`` is stored in bit ``r % 64`` of word ``r // 64``; unused bits of
+    the last word are zero.
+    """
+
+    rows, columns = matrix.shape
+    words = -(-rows // WORD_BITS)
+    packed = np.packbits(matrix.T.astype(bool), axis=1, bitorder="little")
+    padded = np.zeros((columns, words * 8), dtype=np.uint8)
+    padded[:, : packed.shape[1]] = packed
+    return padded.view("<u8").astype(np.uint64)
+
+
+def pack(vector: np.ndarray) -> np.ndarray:
+    """Pack a 0/1 vector into a one-dimensional bitset."""
+
+    return pack_columns(np.asarray(vector).reshape(-1, 1))[0]
+
+
+def full(size: int) -> np.ndarray:
+    """Return a bitset with the first ``size`` bits set."""
+
+    return pack(np.ones(size, dtype=np.uint8))
+
+
+@njit(cache=True)
+def popcount64(word: np.uint64) -> int:
+    """Return the number of set bits in a single 64-bit word."""
+
+    word = word - ((word >> np.uint64(1)) & _M1)
+    word = (word & _M2) + ((word >> np.uint64(2)) & _M2)
+    word = (word + (word >> np.uint64(4))) & _M4
+    return np.int64((word * _H01) >> np.uint64(56))
+
+
+@njit(cache=True)
+def count_intersection(first: np.ndarray, second: np.ndarray, third: np.ndarray) -> int:
+    """Return the number of bits set in all three equally long bitsets."""
+
+    total = 0
+    for i in range(first.shape[0]):
+        total += popcount64(first[i] & second[i] & third[i])
+    return total
@@ -17,6 +17,16 @@ def _positive_flag(value: str) -> bool:
     raise argparse.ArgumentTypeError("Expected yes or no")
 
 
+def _seed(value: str) -> int:
+    try:
+        seed = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Expected a non-negative integer") from None
+    if seed < 0:
+        raise argparse.ArgumentTypeError("Expected a non-negative integer")
+    return seed
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Run ID3 decision tree experiments with entropy and variance heuristics.",
@@ -38,6 +48,18 @@ def build_parser() -> argparse.ArgumentParser:
         default="both",
         help="Which heuristic(s) to run",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for evaluating pruning candidates; 1 runs in-process",
+    )
+    parser.add_argument(
+        "--seed",
+        type=_seed,
+        default=None,
+        help="Seed for the post-pruning random generator; None picks a fresh seed",
+    )
     return parser
 
 
@@ -55,6 +77,8 @@ def run(
     test_set: str,
     print_tree: bool,
     metric: Literal["entropy", "variance", "both"] = "both",
+    jobs: int = 1,
+    seed: int | None = None,
 ) -> dict[str, float]:
     """Execute the selected experiments and return a summary of accuracies."""
 
@@ -68,6 +92,8 @@ def run(
             l,
             k,
             print_tree,
+            jobs,
+            seed,
         )
         _print_result("Entropy heuristic", entropy_result)
         summary.update({
@@ -83,6 +109,8 @@ def run(
             l,
             k,
             print_tree,
+            jobs,
+            seed,
         )
         _print_result("Variance heuristic", variance_result)
         summary.update({
@@ -104,6 +132,8 @@ def main(argv: list[str] | None = None) -> dict[str, float]:
         test_set=args.test_set,
         print_tree=args.print_tree,
         metric=args.metric,
+        jobs=args.jobs,
+        seed=args.seed,
     )
 
 
@@ -0,0 +1,85 @@
+"""Loading binary CSV datasets into NumPy arrays."""
+
+from __future__ import annotations
+
+import csv
+import functools
+import os
+import warnings
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+
+
+TARGET_COLUMN = "Class"
+# Parsed files kept by load_csv; a run reads at most a training, validation
+# and test set.
+CACHE_SIZE = 8
+
+
+class Dataset(NamedTuple):
+    """Binary attributes and class labels read from a CSV file.
+
+    ``features`` is a C-contiguous ``uint8`` matrix with one column per entry
+    of ``feature_names`` and ``target`` the matching ``uint8`` class labels.
+    """
+
+    features: np.ndarray
+    target: np.ndarray
+    feature_names: List[str]
+
+    def features_for(self, feature_names: Sequence[str]) -> np.ndarray:
+        """Return the attribute matrix with its columns ordered as ``feature_names``."""
+
+        if list(feature_names) == self.feature_names:
+            return self.features
+        positions = {name: position for position, name in enumerate(self.feature_names)}
+        try:
+            order = [positions[name] for name in feature_names]
+        except KeyError as error:
+            raise ValueError(f"Dataset has no attribute {error.args[0]!r}") from None
+        return np.ascontiguousarray(self.features[:, order])
+
+
+def load_csv(path: str) -> Dataset:
+    """Read a CSV file of 0/1 values with a header row and a ``Class`` column.
+
+    Files are parsed once and shared between callers until they change on
+    disk, so running both heuristics on the same inputs does not read them
+    twice. The returned arrays are read-only for that reason.
+    """
+
+    stat = os.stat(path)
+    try:
+        return _read_csv(os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+    except ValueError as error:
+        # Parsed files are cached by their resolved path; report the one given.
+        raise ValueError(f"{path} {error}") from None
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _read_csv(path: str, mtime_ns: int, size: int) -> Dataset:
+    with open(path, newline="") as handle:
+        header = next(csv.reader(handle))
+    if TARGET_COLUMN not in header:
+        raise ValueError(f"has no {TARGET_COLUMN!r} column")
+    class_index = header.index(TARGET_COLUMN)
+
+    with warnings.catch_warnings():
+        # A file without rows warns here; the shape check below reports it.
+        warnings.simplefilter("ignore", UserWarning)
+        matrix = np.loadtxt(path, dtype=np.uint8, delimiter=",", skiprows=1, ndmin=2)
+    if not matrix.size:
+        raise ValueError("has no data rows")
+    if matrix.shape[1] != len(header):
+        raise ValueError(
+            f"has {matrix.shape[1]} columns per row but {len(header)} in its header"
+        )
+    if matrix.max(initial=0) > 1:
+        raise ValueError("contains values other than 0 and 1")
+    features = np.ascontiguousarray(np.delete(matrix, class_index, axis=1))
+    target = np.ascontiguousarray(matrix[:, class_index])
+    feature_names = [name for index, name in enumerate(header) if index != class_index]
+    features.flags.writeable = False
+    target.flags.writeable = False
+    return Dataset(features, target, feature_names)
@@ -2,18 +2,18 @@
 
 from __future__ import annotations
 
-import copy
 import math
-import random
 from dataclasses import dataclass
-from typing import List, Sequence
+from typing import Tuple
 
-import pandas as pd
+import numpy as np
+from numba import njit
 
-from . import tree
+from . import bitset, data, pruning, split, tree
 
 
-TARGET_COLUMN = "Class"
+# _XLOGX[i] == i * log2(i), grown by construct_tree to cover the training set.
+_XLOGX = np.zeros(1)
 
 
 @dataclass
@@ -26,6 +26,7 @@ class EntropyRunResult:
     accuracy_after_pruning: float
 
 
+@njit(cache=True)
 def entropy(positive_count: int, negative_count: int) -> float:
     """Return the entropy for the supplied class distribution."""
 
@@ -36,135 +37,214 @@ def entropy(positive_count: int, negative_count: int) -> float:
     p_neg = negative_count / total
     if positive_count == 0 or negative_count == 0:
         return 0.0
-    return -p_pos * math.log(p_pos, 2) - p_neg * math.log(p_neg, 2)
+    return -p_pos * math.log2(p_pos) - p_neg * math.log2(p_neg)
+
+
+def _ensure_xlogx(size: int) -> None:
+    """Make sure ``_XLOGX`` covers every count up to ``size``."""
+
+    global _XLOGX
+    if len(_XLOGX) > size:
+        return
+    counts = np.arange(size + 1, dtype=np.float64)
+    counts[0] = 1.0
+    table = counts * np.log2(counts)
+    table[0] = 0.0
+    _XLOGX = table
+
+
+@njit(cache=True)
+def _attribute_gain(
+    total_entropy: float,
+    xlogx: np.ndarray,
+    positives: int,
+    negatives: int,
+    ones: int,
+    positive_1: int,
+) -> float:
+    """Return the information gain of a split given its contingency counts.
+
+    ``ones`` is the number of active rows where the attribute is 1 and
+    ``positive_1`` how many of those rows are positive.
+    """
+
+    total = positives + negatives
+    negative_1 = ones - positive_1
+    positive_0 = positives - positive_1
+    negative_0 = negatives - negative_1
+    # |S_v| * Entropy(S_v) == n log2 n - (p log2 p + q log2 q) for n = p + q. The
+    # grouping keeps the result identical when the counts are mirrored, so
+    # equivalent splits tie exactly and the first attribute wins.
+    weighted_0 = xlogx[negative_0 + positive_0] - (xlogx[positive_0] + xlogx[negative_0])
+    weighted_1 = xlogx[negative_1 + positive_1] - (xlogx[positive_1] + xlogx[negative_1])
+    return total_entropy - (weighted_0 + weighted_1) / total
+
+
+@njit(cache=True)
+def _gain_bound(
+    total_entropy: float, xlogx: np.ndarray, positives: int, negatives: int, ones: int
+) -> float:
+    """Return an upper bound on the information gain of a split with ``ones`` rows at 1.
+
+    The gain is the mutual information between attribute and class, which
+    cannot exceed the entropy of either; the attribute's entropy only needs
+    the split sizes.
+    """
+
+    total = positives + negatives
+    split_entropy = (xlogx[total] - (xlogx[ones] + xlogx[total - ones])) / total
+    return min(total_entropy, split_entropy)
+
+
+_SEARCH = split.compile_search("entropy_gains", _gain_bound, _attribute_gain)
 
 
 def _information_gain(
-    total_entropy: float, dataset: pd.DataFrame, attributes: Sequence[str]
-) -> str:
-    """Return the attribute that maximises information gain."""
-
-    gains: List[float] = []
-    for attribute in attributes:
-        subtotal = 0.0
-        for value in (0, 1):
-            subset = dataset.loc[dataset[attribute] == value]
-            negative = len(subset.loc[subset[TARGET_COLUMN] == 0])
-            positive = len(subset.loc[subset[TARGET_COLUMN] == 1])
-            subset_entropy = entropy(positive, negative)
-            subtotal += ((negative + positive) / len(dataset)) * subset_entropy
-        gains.append(total_entropy - subtotal)
-    max_index = gains.index(max(gains))
-    return attributes[max_index]
+    total_entropy: float,
+    columns: np.ndarray,
+    target: np.ndarray,
+    active: np.ndarray,
+    attribute_mask: np.ndarray,
+    positives: int,
+    negatives: int,
+) -> Tuple[int, split.BranchCounts]:
+    """Return the attribute that maximises information gain and its branch counts."""
+
+    return split.best_split(
+        _SEARCH,
+        total_entropy,
+        _XLOGX,
+        columns,
+        target,
+        active,
+        attribute_mask,
+        positives,
+        negatives,
+    )
 
 
 def _create_node(
     decision_tree: tree.BTree,
-    parent_idx: int | None,
+    parent_node: tree.Node | None,
     branch_value: int | None,
-    value: str,
+    feature: int,
+    label: int,
     zeroes: int,
     ones: int,
-) -> int:
-    if parent_idx is None:
+) -> tree.Node:
+    if parent_node is None:
         if decision_tree.get_root() is None:
-            return decision_tree.add_root(value, zeroes, ones)
+            return decision_tree.add_root(feature, label, zeroes, ones)
         raise ValueError("Root already exists")
     if branch_value == 0:
-        return decision_tree.add_left_child(parent_idx, value, zeroes, ones)
+        return decision_tree.add_left_child(parent_node, feature, label, zeroes, ones)
     if branch_value == 1:
-        return decision_tree.add_right_child(parent_idx, value, zeroes, ones)
+        return decision_tree.add_right_child(parent_node, feature, label, zeroes, ones)
     raise ValueError("Branch value must be 0 or 1 for non-root nodes")
 
 
 def _build_tree(
-    dataset: pd.DataFrame,
-    attributes: Sequence[str],
+    columns: np.ndarray,
+    target: np.ndarray,
+    active: np.ndarray,
+    zeroes: int,
+    ones: int,
+    attribute_mask: np.ndarray,
     decision_tree: tree.BTree,
-    parent_idx: int | None = None,
+    parent_node: tree.Node | None = None,
     branch_value: int | None = None,
 ) -> None:
-    ones = len(dataset.loc[dataset[TARGET_COLUMN] == 1])
-    zeroes = len(dataset.loc[dataset[TARGET_COLUMN] == 0])
-
     if ones == 0:
-        _create_node(decision_tree, parent_idx, branch_value, "0", zeroes, ones)
+        _create_node(decision_tree, parent_node, branch_value, -1, 0, zeroes, ones)
         return
     if zeroes == 0:
-        _create_node(decision_tree, parent_idx, branch_value, "1", zeroes, ones)
+        _create_node(decision_tree, parent_node, branch_value, -1, 1, zeroes, ones)
         return
-    if not attributes:
-        label = "1" if ones >= zeroes else "0"
-        _create_node(decision_tree, parent_idx, branch_value, label, zeroes, ones)
+    if not attribute_mask.any():
+        label = 1 if ones >= zeroes else 0
+        _create_node(decision_tree, parent_node, branch_value, -1, label, zeroes, ones)
         return
 
     total_entropy = entropy(ones, zeroes)
-    best_attribute = _information_gain(total_entropy, dataset, attributes)
+    best_column, branch_counts = _information_gain(
+        total_entropy, columns, target, active, attribute_mask, ones, zeroes
+    )
 
-    current_idx = _create_node(
-        decision_tree, parent_idx, branch_value, best_attribute, zeroes, ones
+    current_node = _create_node(
+        decision_tree, parent_node, branch_value, best_column, -1, zeroes, ones
     )
 
-    remaining_attributes = [attribute for attribute in attributes if attribute != best_attribute]
-    for value in (0, 1):
-        subset = dataset.loc[dataset[best_attribute] == value]
-        if subset.empty:
-            label = "1" if ones >= zeroes else "0"
-            _create_node(decision_tree, current_idx, value, label, zeroes, ones)
+    attribute_mask[best_column] = False
+    branches = (
+        (0, active & ~columns[best_column]),
+        (1, active & columns[best_column]),
+    )
+    for (value, subset), (branch_zeroes, branch_ones) in zip(branches, branch_counts):
+        if branch_zeroes + branch_ones == 0:
+            label = 1 if ones >= zeroes else 0
+            _create_node(decision_tree, current_node, value, -1, label, zeroes, ones)
         else:
-            _build_tree(subset, remaining_attributes, decision_tree, current_idx, value)
-
-
-def construct_tree(dataset: pd.DataFrame) -> tree.BTree:
+            _build_tree(
+                columns,
+                target,
+                subset,
+                branch_zeroes,
+                branch_ones,
+                attribute_mask,
+                decision_tree,
+                current_node,
+                value,
+            )
+    attribute_mask[best_column] = True
+
+
+def construct_tree(dataset: data.Dataset) -> tree.BTree:
     """Train an ID3 decision tree using entropy as the split criterion."""
 
-    attributes = list(dataset.drop(columns=[TARGET_COLUMN]).columns)
-    decision_tree = tree.BTree()
-    _build_tree(dataset, attributes, decision_tree)
+    attributes = dataset.feature_names
+    columns = bitset.pack_columns(dataset.features)
+    target = bitset.pack(dataset.target)
+    active = bitset.full(len(dataset.target))
+    attribute_mask = np.ones(len(attributes), dtype=bool)
+    _ensure_xlogx(len(dataset.target))
+    ones = int(np.count_nonzero(dataset.target))
+    zeroes = len(dataset.target) - ones
+    decision_tree = tree.BTree(attributes)
+    _build_tree(columns, target, active, zeroes, ones, attribute_mask, decision_tree)
     return decision_tree
 
 
-def calculate_accuracy(dataset: pd.DataFrame, decision_tree: tree.BTree) -> float:
+def calculate_accuracy(dataset: data.Dataset, decision_tree: tree.BTree) -> float:
     """Return the classification accuracy of ``decision_tree`` on ``dataset``."""
 
-    predictors = dataset.drop(columns=[TARGET_COLUMN])
-    root = decision_tree.get_root()
-    if root is None:
+    if decision_tree.get_root() is None:
         raise ValueError("Decision tree has no root node")
-
-    matches = 0
-    for index, row in predictors.iterrows():
-        prediction = decision_tree.traverse(root, row)
-        if prediction == dataset[TARGET_COLUMN].iloc[index]:
-            matches += 1
-    return (matches / len(dataset)) * 100
+    samples = dataset.features_for(decision_tree.feature_names)
+    return tree.accuracy(decision_tree.to_arrays(), samples, dataset.target)
 
 
 def post_pruning(
     l: int,
     k: int,
-    validation: pd.DataFrame,
+    validation: data.Dataset,
     base_tree: tree.BTree,
     print_tree: bool = False,
+    jobs: int = 1,
+    seed: int | None = None,
 ) -> tree.BTree:
     """Apply the randomized post-pruning heuristic described in the assignment."""
 
-    best_tree = copy.deepcopy(base_tree)
-    current_best = calculate_accuracy(validation, best_tree)
-    for _ in range(max(l, 1)):
-        candidate = copy.deepcopy(base_tree)
-        for _ in range(max(random.randint(1, max(k, 1)), 1)):
-            non_leaves = candidate.get_non_leaves()
-            if not non_leaves:
-                break
-            node_to_prune = random.choice(non_leaves)
-            node_to_prune.left = None
-            node_to_prune.right = None
-            node_to_prune.value = "1" if node_to_prune.ones >= node_to_prune.zeroes else "0"
-        candidate_accuracy = calculate_accuracy(validation, candidate)
-        if candidate_accuracy > current_best:
-            best_tree = candidate
-            current_best = candidate_accuracy
+    samples = validation.features_for(base_tree.feature_names)
+    best_arrays = pruning.random_pruning(
+        base_tree.to_arrays(),
+        l,
+        k,
+        np.random.SeedSequence(seed),
+        samples,
+        validation.target,
+        jobs,
+    )
+    best_tree = tree.BTree.from_arrays(best_arrays, base_tree.feature_names)
     if print_tree:
         print("Pruned entropy tree:")
         best_tree.print_btree()
@@ -178,12 +258,14 @@ def run_entropy(
     l: int,
     k: int,
     print_tree: bool = False,
+    jobs: int = 1,
+    seed: int | None = None,
 ) -> EntropyRunResult:
     """Train, optionally prune, and evaluate an entropy-based ID3 tree."""
 
-    training = pd.read_csv(training_path)
-    validation = pd.read_csv(validation_path)
-    test = pd.read_csv(test_path)
+    training = data.load_csv(training_path)
+    validation = data.load_csv(validation_path)
+    test = data.load_csv(test_path)
 
     decision_tree = construct_tree(training)
     if print_tree:
@@ -191,7 +273,9 @@ def run_entropy(
         decision_tree.print_btree()
 
     accuracy_before = calculate_accuracy(test, decision_tree)
-    pruned_tree = post_pruning(l, k, validation, decision_tree, print_tree)
+    pruned_tree = post_pruning(
+        l, k, validation, decision_tree, print_tree, jobs, seed
+    )
     accuracy_after = calculate_accuracy(test, pruned_tree)
 
     return EntropyRunResult(
@@ -0,0 +1,220 @@
+"""Randomized post-pruning shared by the entropy and variance learners."""
+
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from . import tree
+
+
+_WorkerState = Tuple[
+    tree.TreeArrays,
+    tree.NonLeafSet,
+    np.ndarray,
+    np.ndarray,
+    int,
+    int,
+    np.random.SeedSequence,
+]
+
+_worker_state: Optional[_WorkerState] = None
+
+
+def pruning_deltas(
+    arrays: tree.TreeArrays, samples: np.ndarray, targets: np.ndarray
+) -> Tuple[np.ndarray, int]:
+    """Return the per-node change in correct predictions caused by pruning.
+
+    ``deltas[n]`` is the number of ``samples`` that turning node ``n`` into a
+    majority leaf classifies correctly minus the number its unpruned subtree
+    classifies correctly. The second value is the number of samples the
+    unpruned tree gets right. Together they score any pruning of ``arrays``
+    without running the samples through the tree again.
+    """
+
+    negatives, positives = tree.node_class_counts(arrays, samples, targets)
+    majority = arrays.ones >= arrays.zeroes
+    correct_if_pruned = np.where(majority, positives, negatives)
+    correct_if_kept = np.where(arrays.label == 1, positives, negatives)
+    # Reversed pre-order visits children before their parents.
+    for idx in reversed(arrays.non_leaves()):
+        correct_if_kept[idx] = correct_if_kept[arrays.children[idx]].sum()
+    base_correct = int(correct_if_kept[0]) if len(correct_if_kept) else 0
+    return correct_if_pruned - correct_if_kept, base_correct
+
+
+def _candidate_rng(
+    seed_sequence: np.random.SeedSequence, index: int
+) -> np.random.Generator:
+    """Return the generator of candidate ``index``.
+
+    Its seed equals ``seed_sequence.spawn(l)[index]`` but is derived on
+    demand, so the ``l`` children never need to exist at the same time.
+    """
+
+    child = np.random.SeedSequence(
+        seed_sequence.entropy,
+        spawn_key=(*seed_sequence.spawn_key, index),
+        pool_size=seed_sequence.pool_size,
+    )
+    return np.random.default_rng(child)
+
+
+def _one_candidate(
+    base_arrays: tree.TreeArrays,
+    non_leaves: tree.NonLeafSet,
+    pruned: np.ndarray,
+    deltas: np.ndarray,
+    base_correct: int,
+    k: int,
+    rng: np.random.Generator,
+) -> Tuple[int, List[int]]:
+    """Prune ``M ~ U(1, k)`` random non-leaves of the base tree.
+
+    The base tree is never modified: ``non_leaves`` and the boolean
+    ``pruned`` array are scratch state that is updated while the candidate
+    is built and restored before returning. Returns the number of validation
+    samples the candidate classifies correctly, derived from ``deltas``,
+    together with the pruned nodes in the order they were pruned.
+    """
+
+    prunes: List[int] = []
+    correct = base_correct
+    for _ in range(int(rng.integers(1, max(k, 1), endpoint=True))):
+        if not non_leaves:
+            break
+        node_to_prune = non_leaves[int(rng.integers(len(non_leaves)))]
+        stack = [node_to_prune]
+        while stack:
+            idx = stack.pop()
+            if pruned[idx]:
+                # An earlier prune inside this subtree is superseded.
+                correct -= int(deltas[idx])
+            elif base_arrays.label[idx] < 0:
+                non_leaves.discard(idx)
+                stack.extend(base_arrays.children[idx].tolist())
+        correct += int(deltas[node_to_prune])
+        pruned[node_to_prune] = True
+        prunes.append(node_to_prune)
+    pruned[prunes] = False
+    non_leaves.restore()
+    return correct, prunes
+
+
+def _best_candidate(state: _WorkerState, start: int, stop: int) -> Tuple[int, List[int]]:
+    """Return the score and prunes of the first best candidate in ``[start, stop)``.
+
+    A candidate only wins if it beats the base tree; otherwise the base score
+    is returned with no prunes.
+    """
+
+    base_arrays, non_leaves, pruned, deltas, base_correct, k, seed_sequence = state
+    best_correct, best_prunes = base_correct, []
+    for index in range(start, stop):
+        correct, prunes = _one_candidate(
+            base_arrays,
+            non_leaves,
+            pruned,
+            deltas,
+            base_correct,
+            k,
+            _candidate_rng(seed_sequence, index),
+        )
+        if correct > best_correct:
+            best_correct, best_prunes = correct, prunes
+    return best_correct, best_prunes
+
+
+def _init_worker(
+    base_arrays: tree.TreeArrays,
+    base_non_leaves: tree.NonLeafSet,
+    deltas: np.ndarray,
+    base_correct: int,
+    k: int,
+    seed_sequence: np.random.SeedSequence,
+) -> None:
+    global _worker_state
+    pruned = np.zeros(len(base_arrays.label), dtype=bool)
+    _worker_state = (
+        base_arrays, base_non_leaves, pruned, deltas, base_correct, k, seed_sequence
+    )
+
+
+def _worker_best(start: int, stop: int) -> Tuple[int, List[int]]:
+    if _worker_state is None:
+        raise RuntimeError("Pruning worker was not initialised")
+    return _best_candidate(_worker_state, start, stop)
+
+
+def random_pruning(
+    base_arrays: tree.TreeArrays,
+    l: int,
+    k: int,
+    seed_sequence: np.random.SeedSequence,
+    samples: np.ndarray,
+    targets: np.ndarray,
+    jobs: int = 1,
+) -> tree.TreeArrays:
+    """Return the most accurate of ``l`` randomly pruned candidates.
+
+    Candidate ``i`` prunes ``M_i ~ U(1, k)`` nodes, drawing ``M_i`` and the
+    pruned nodes from its own generator seeded by the ``i``-th child of
+    ``seed_sequence``. The result therefore only depends on
+    ``seed_sequence`` and not on how candidates are distributed over
+    ``jobs`` worker processes. Candidates are cheap to score, so the default
+    of one evaluates them in-process without starting a pool. The base tree
+    is returned unless a candidate strictly improves accuracy on ``samples``.
+
+    Candidates are scored against the shared base tree and only the best one
+    so far is kept; the winner is the only candidate turned into arrays.
+    """
+
+    base_non_leaves = tree.NonLeafSet(base_arrays.non_leaves(), len(base_arrays.label))
+    candidates = max(l, 1)
+    deltas, base_correct = pruning_deltas(base_arrays, samples, targets)
+    workers = min(max(jobs, 1), candidates)
+
+    if workers <= 1:
+        pruned = np.zeros(len(base_arrays.label), dtype=bool)
+        state = (
+            base_arrays, base_non_leaves, pruned, deltas, base_correct, k, seed_sequence
+        )
+        _, best_prunes = _best_candidate(state, 0, candidates)
+    else:
+        # A few ranges per worker keep the pool busy when candidates differ
+        # in cost, while each range only sends back its best candidate.
+        size = -(-candidates // (workers * 4))
+        starts = range(0, candidates, size)
+        stops = [min(start + size, candidates) for start in starts]
+        best_correct, best_prunes = base_correct, []
+        # Forking once Numba's threading layer is running can deadlock, so
+        # workers are always started fresh.
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                base_arrays,
+                base_non_leaves,
+                deltas,
+                base_correct,
+                k,
+                seed_sequence,
+            ),
+        ) as executor:
+            # Ranges come back in order, so ties go to the earliest candidate
+            # exactly as in a serial run.
+            for correct, prunes in executor.map(_worker_best, starts, stops):
+                if correct > best_correct:
+                    best_correct, best_prunes = correct, prunes
+
+    if not best_prunes:
+        return base_arrays
+    best_arrays = base_arrays.copy()
+    for idx in best_prunes:
+        best_arrays.prune(idx)
+    return best_arrays
@@ -0,0 +1,143 @@
+"""Split search shared by the entropy and variance heuristics."""
+
+from __future__ import annotations
+
+import types
+from typing import Callable, Tuple
+
+import numpy as np
+from numba import njit, prange
+
+from . import bitset
+
+
+# Below this many attributes the thread start-up cost outweighs the split search.
+PARALLEL_MIN_ATTRIBUTES = 8
+# Gains this close to the best one are ties, which go to the lowest column.
+TIE_TOLERANCE = 1e-12
+# Absorbs rounding so an attribute is only skipped when its bound is clearly lower.
+# It must not be below TIE_TOLERANCE or a tied attribute could go unscored.
+BOUND_SLACK = TIE_TOLERANCE
+
+
+BranchCounts = Tuple[Tuple[int, int], Tuple[int, int]]
+
+
+def _gains(
+    parent_score: float,
+    table: np.ndarray,
+    columns: np.ndarray,
+    target: np.ndarray,
+    active: np.ndarray,
+    attribute_mask: np.ndarray,
+    positives: int,
+    negatives: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return every attribute's gain, split size and positive count at 1.
+
+    Template for :func:`compile_search`, which binds ``gain_bound`` and
+    ``attribute_gain`` to one heuristic's functions. Skipped and masked
+    attributes have a gain of ``-inf``.
+    """
+
+    n_attributes = columns.shape[0]
+    ones = np.zeros(n_attributes, dtype=np.int64)
+    bounds = np.full(n_attributes, -np.inf)
+    for attribute in prange(n_attributes):
+        if attribute_mask[attribute]:
+            count = 0
+            for word in range(active.shape[0]):
+                count += bitset.popcount64(columns[attribute, word] & active[word])
+            ones[attribute] = count
+            bounds[attribute] = gain_bound(parent_score, table, positives, negatives, count)
+
+    gains = np.full(n_attributes, -np.inf)
+    first = np.argmax(bounds)
+    positive_ones = np.zeros(n_attributes, dtype=np.int64)
+    positive_ones[first] = bitset.count_intersection(columns[first], target, active)
+    gains[first] = attribute_gain(
+        parent_score, table, positives, negatives, ones[first], positive_ones[first]
+    )
+    threshold = gains[first] - BOUND_SLACK
+    for attribute in prange(n_attributes):
+        if attribute != first and bounds[attribute] >= threshold:
+            positive_ones[attribute] = bitset.count_intersection(
+                columns[attribute], target, active
+            )
+            gains[attribute] = attribute_gain(
+                parent_score,
+                table,
+                positives,
+                negatives,
+                ones[attribute],
+                positive_ones[attribute],
+            )
+    return gains, ones, positive_ones
+
+
+def compile_search(
+    name: str, gain_bound: Callable, attribute_gain: Callable
+) -> Tuple[Callable, Callable]:
+    """Return serial and parallel builds of the split search for one heuristic.
+
+    ``gain_bound(parent_score, table, positives, negatives, ones)`` and
+    ``attribute_gain(parent_score, table, positives, negatives, ones,
+    positive_1)`` must be Numba functions. They are bound as globals of a
+    copy of :func:`_gains` named ``name`` rather than passed as arguments,
+    because Numba cannot cache kernels that take functions as arguments.
+    Each build also gets its own name, since the cache does not tell serial
+    and parallel builds of one function apart.
+    """
+
+    namespace = dict(globals(), gain_bound=gain_bound, attribute_gain=attribute_gain)
+
+    def build(kernel_name: str, parallel: bool) -> Callable:
+        impl = types.FunctionType(_gains.__code__, namespace, kernel_name)
+        impl.__qualname__ = kernel_name
+        impl.__doc__ = _gains.__doc__
+        return njit(cache=True, parallel=parallel)(impl)
+
+    return build(name, False), build(f"{name}_parallel", True)
+
+
+def best_split(
+    kernels: Tuple[Callable, Callable],
+    parent_score: float,
+    table: np.ndarray,
+    columns: np.ndarray,
+    target: np.ndarray,
+    active: np.ndarray,
+    attribute_mask: np.ndarray,
+    positives: int,
+    negatives: int,
+) -> Tuple[int, BranchCounts]:
+    """Return the best unmasked column and the ``(zeroes, ones)`` counts of its branches.
+
+    ``columns``, ``target`` and ``active`` are bitsets packed by :mod:`bitset`
+    and ``positives``/``negatives`` the class counts of the ``active`` rows.
+    Attributes are first bounded from their split sizes alone, and only those
+    whose bound can still beat the best gain so far are scored. The parallel
+    build runs once there are ``PARALLEL_MIN_ATTRIBUTES`` attributes.
+    """
+
+    serial, parallel = kernels
+    kernel = parallel if columns.shape[0] >= PARALLEL_MIN_ATTRIBUTES else serial
+    gains, ones, positive_ones = kernel(
+        parent_score, table, columns, target, active, attribute_mask, positives, negatives
+    )
+    best_column = first_best(gains)
+    positive_1 = int(positive_ones[best_column])
+    negative_1 = int(ones[best_column]) - positive_1
+    branch_counts = (
+        (negatives - negative_1, positives - positive_1),
+        (negative_1, positive_1),
+    )
+    return best_column, branch_counts
+
+
+def first_best(gains: np.ndarray) -> int:
+    """Return the lowest column whose gain is within ``TIE_TOLERANCE`` of the best."""
+
+    # Gains are computed per attribute and round differently, so equal gains
+    # can differ in the last bits.
+    return int(np.argmax(gains >= gains.max() - TIE_TOLERANCE))
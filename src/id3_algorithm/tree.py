@@ -3,14 +3,22 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from numba import njit
 
 
 @dataclass
 class Node:
-    """Single node inside a binary decision tree."""
+    """Single node inside a binary decision tree.
+
+    Internal nodes store the column they test in ``feature`` and leaves the
+    class in ``label``; the field that does not apply is ``-1``.
+    """
 
-    value: Optional[str]
+    feature: int
+    label: int
     idx: int
     zeroes: int
     ones: int
@@ -18,46 +26,145 @@ class Node:
     right: Optional["Node"] = None
 
 
+class TreeArrays(NamedTuple):
+    """Struct-of-arrays layout of a :class:`BTree`, indexed by ``Node.idx``.
+
+    ``feature`` holds the column tested at internal nodes, ``children`` the
+    ``(left, right)`` child indices so that ``children[n, value]`` is the
+    branch taken for an attribute value, and ``label`` the class at leaves.
+    Entries that do not apply to a node are ``-1``. ``zeroes``/``ones`` keep
+    the training class counts of every node so that it can be turned into a
+    majority leaf.
+    """
+
+    feature: np.ndarray
+    children: np.ndarray
+    label: np.ndarray
+    zeroes: np.ndarray
+    ones: np.ndarray
+
+    def copy(self) -> "TreeArrays":
+        """Return an independent copy of every array."""
+
+        return TreeArrays(*(array.copy() for array in self))
+
+    def non_leaves(self) -> List[int]:
+        """Return the internal nodes reachable from the root in pre-order."""
+
+        nodes: List[int] = []
+        stack = [0] if len(self.label) else []
+        while stack:
+            idx = stack.pop()
+            if self.label[idx] >= 0:
+                continue
+            nodes.append(idx)
+            stack.append(int(self.children[idx, 1]))
+            stack.append(int(self.children[idx, 0]))
+        return nodes
+
+    def prune(self, idx: int) -> None:
+        """Replace the subtree at ``idx`` with a leaf carrying its majority class."""
+
+        self.label[idx] = 1 if self.ones[idx] >= self.zeroes[idx] else 0
+        self.feature[idx] = -1
+        self.children[idx] = -1
+
+
+class NonLeafSet:
+    """Set of internal node indices with O(1) removal and random access.
+
+    Removal swaps the last entry into the freed slot, so the order of the
+    remaining nodes is not preserved. Removals are journaled so that
+    :meth:`restore` can undo them without copying the set.
+    """
+
+    def __init__(self, nodes: Sequence[int], size: int) -> None:
+        self._nodes: List[int] = list(nodes)
+        self._slots = np.full(size, -1, dtype=np.int32)
+        self._slots[self._nodes] = np.arange(len(self._nodes), dtype=np.int32)
+        self._journal: List[Tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __getitem__(self, position: int) -> int:
+        return self._nodes[position]
+
+    def discard(self, idx: int) -> None:
+        """Remove ``idx`` from the set if present."""
+
+        slot = self._slots[idx]
+        if slot < 0:
+            return
+        last = self._nodes.pop()
+        if last != idx:
+            self._nodes[slot] = last
+            self._slots[last] = slot
+        self._slots[idx] = -1
+        self._journal.append((idx, int(slot)))
+
+    def restore(self) -> None:
+        """Undo every removal, returning the set to its original order."""
+
+        while self._journal:
+            idx, slot = self._journal.pop()
+            if slot < len(self._nodes):
+                last = self._nodes[slot]
+                self._nodes[slot] = idx
+                self._slots[last] = len(self._nodes)
+                self._nodes.append(last)
+            else:
+                self._nodes.append(idx)
+            self._slots[idx] = slot
+
+
 class BTree:
     """Binary tree tailored for ID3 style decision trees."""
 
-    def __init__(self) -> None:
+    def __init__(self, feature_names: Sequence[str] = ()) -> None:
         self.root: Optional[Node] = None
+        self.feature_names: List[str] = list(feature_names)
         self._counter: int = 0
 
-    def add_root(self, value: Optional[str], zeroes: int, ones: int) -> int:
-        """Create the root node and return its index."""
+    def _new_node(self, feature: int, label: int, zeroes: int, ones: int) -> Node:
+        return Node(
+            feature=feature, label=label, idx=self._counter, zeroes=zeroes, ones=ones
+        )
+
+    def add_root(self, feature: int, label: int, zeroes: int, ones: int) -> Node:
+        """Create the root node and return it."""
 
         if self.root is not None:
             raise ValueError("Root node already exists")
-        self.root = Node(value=value, idx=self._counter, zeroes=zeroes, ones=ones)
-        return self._counter
+        self._counter = 0
+        self.root = self._new_node(feature, label, zeroes, ones)
+        return self.root
 
     def add_left_child(
-        self, parent_idx: int, value: Optional[str], zeroes: int, ones: int
-    ) -> int:
-        """Attach a node as the left child of the provided parent."""
+        self, parent: Node, feature: int, label: int, zeroes: int, ones: int
+    ) -> Node:
+        """Attach a node as the left child of ``parent`` and return it."""
 
-        parent = self._find_node(parent_idx)
         self._counter += 1
-        parent.left = Node(value=value, idx=self._counter, zeroes=zeroes, ones=ones)
-        return parent.left.idx
+        parent.left = self._new_node(feature, label, zeroes, ones)
+        return parent.left
 
     def add_right_child(
-        self, parent_idx: int, value: Optional[str], zeroes: int, ones: int
-    ) -> int:
-        """Attach a node as the right child of the provided parent."""
+        self, parent: Node, feature: int, label: int, zeroes: int, ones: int
+    ) -> Node:
+        """Attach a node as the right child of ``parent`` and return it."""
 
-        parent = self._find_node(parent_idx)
         self._counter += 1
-        parent.right = Node(value=value, idx=self._counter, zeroes=zeroes, ones=ones)
-        return parent.right.idx
+        parent.right = self._new_node(feature, label, zeroes, ones)
+        return parent.right
 
-    def set_node_value(self, node_idx: int, value: str, zeroes: int, ones: int) -> None:
-        """Overwrite the label stored at a node."""
+    def set_node_value(
+        self, node: Node, feature: int, label: int, zeroes: int, ones: int
+    ) -> None:
+        """Overwrite the split or label stored at a node."""
 
-        node = self._find_node(node_idx)
-        node.value = value
+        node.feature = feature
+        node.label = label
         node.zeroes = zeroes
         node.ones = ones
 
@@ -101,33 +208,37 @@ class BTree:
             print("<empty tree>")
             return
         if self.root.left is None and self.root.right is None:
-            print(self.root.value)
+            print(self.root.label)
             return
         self._print_subtree(self.root, depth=0)
 
     def _print_subtree(self, node: Node, depth: int) -> None:
         indent = "| " * depth
+        name = self.feature_names[node.feature]
         if node.left is not None:
             if node.left.left is None and node.left.right is None:
-                print(f"{indent}{node.value} = 0 : {node.left.value}")
+                print(f"{indent}{name} = 0 : {node.left.label}")
             else:
-                print(f"{indent}{node.value} = 0 :")
+                print(f"{indent}{name} = 0 :")
                 self._print_subtree(node.left, depth + 1)
         if node.right is not None:
             if node.right.left is None and node.right.right is None:
-                print(f"{indent}{node.value} = 1 : {node.right.value}")
+                print(f"{indent}{name} = 1 : {node.right.label}")
             else:
-                print(f"{indent}{node.value} = 1 :")
+                print(f"{indent}{name} = 1 :")
                 self._print_subtree(node.right, depth + 1)
 
     def traverse(self, node: Node, sample) -> int:
-        """Return the predicted label for ``sample`` starting at ``node``."""
+        """Return the predicted label for ``sample`` starting at ``node``.
+
+        ``sample`` is indexed by column position, in ``feature_names`` order.
+        """
 
         if node.left is None and node.right is None:
-            if node.value is None:
+            if node.label < 0:
                 raise ValueError("Leaf nodes must carry a classification label")
-            return int(node.value)
-        branch = sample[node.value]  # type: ignore[index]
+            return node.label
+        branch = sample[node.feature]
         if branch == 0:
             if node.left is None:
                 raise ValueError("Tree is missing a left branch for value 0")
@@ -136,20 +247,129 @@ class BTree:
             raise ValueError("Tree is missing a right branch for value 1")
         return self.traverse(node.right, sample)
 
-    def _find_node(self, node_idx: int) -> Node:
-        node = self._find_node_recursive(self.root, node_idx)
-        if node is None:
-            raise ValueError(f"Node with index {node_idx} not found")
-        return node
+    def to_arrays(self) -> TreeArrays:
+        """Return the tree in struct-of-arrays form for fast evaluation."""
 
-    def _find_node_recursive(
-        self, node: Optional[Node], node_idx: int
-    ) -> Optional[Node]:
-        if node is None:
-            return None
-        if node.idx == node_idx:
-            return node
-        left = self._find_node_recursive(node.left, node_idx)
-        if left is not None:
-            return left
-        return self._find_node_recursive(node.right, node_idx)
\ No newline at end of file
+        size = self._counter + 1 if self.root is not None else 0
+        feature = np.full(size, -1, dtype=np.int32)
+        children = np.full((size, 2), -1, dtype=np.int32)
+        label = np.full(size, -1, dtype=np.int8)
+        zeroes = np.zeros(size, dtype=np.int32)
+        ones = np.zeros(size, dtype=np.int32)
+
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            zeroes[node.idx] = node.zeroes
+            ones[node.idx] = node.ones
+            if node.left is None and node.right is None:
+                if node.label < 0:
+                    raise ValueError("Leaf nodes must carry a classification label")
+                label[node.idx] = node.label
+                continue
+            if node.left is None or node.right is None:
+                raise ValueError("Internal nodes must have both branches")
+            feature[node.idx] = node.feature
+            children[node.idx] = node.left.idx, node.right.idx
+            stack.extend((node.left, node.right))
+        return TreeArrays(feature, children, label, zeroes, ones)
+
+    @classmethod
+    def from_arrays(cls, arrays: TreeArrays, feature_names: Sequence[str]) -> "BTree":
+        """Rebuild a node based tree from the reachable part of ``arrays``."""
+
+        decision_tree = cls(feature_names)
+        if not len(arrays.label):
+            return decision_tree
+
+        def make_node(idx: int) -> Node:
+            return Node(
+                feature=int(arrays.feature[idx]),
+                label=int(arrays.label[idx]),
+                idx=idx,
+                zeroes=int(arrays.zeroes[idx]),
+                ones=int(arrays.ones[idx]),
+            )
+
+        decision_tree.root = make_node(0)
+        decision_tree._counter = len(arrays.label) - 1
+        stack = [decision_tree.root]
+        while stack:
+            node = stack.pop()
+            if arrays.label[node.idx] >= 0:
+                continue
+            node.left = make_node(int(arrays.children[node.idx, 0]))
+            node.right = make_node(int(arrays.children[node.idx, 1]))
+            stack.extend((node.left, node.right))
+        return decision_tree
+
+
+@njit(cache=True)
+def _predict_rows(
+    feature: np.ndarray, children: np.ndarray, label: np.ndarray, samples: np.ndarray
+) -> np.ndarray:
+    predictions = np.empty(samples.shape[0], dtype=label.dtype)
+    for row in range(samples.shape[0]):
+        idx = 0
+        while label[idx] < 0:
+            idx = children[idx, samples[row, feature[idx]]]
+        predictions[row] = label[idx]
+    return predictions
+
+
+@njit(cache=True)
+def _count_rows(
+    feature: np.ndarray,
+    children: np.ndarray,
+    label: np.ndarray,
+    samples: np.ndarray,
+    targets: np.ndarray,
+    negatives: np.ndarray,
+    positives: np.ndarray,
+) -> None:
+    for row in range(samples.shape[0]):
+        counts = positives if targets[row] == 1 else negatives
+        idx = 0
+        counts[idx] += 1
+        while label[idx] < 0:
+            idx = children[idx, samples[row, feature[idx]]]
+            counts[idx] += 1
+
+
+def predict(arrays: TreeArrays, samples: np.ndarray) -> np.ndarray:
+    """Return the predicted label of every row in ``samples``.
+
+    Each row walks the tree in compiled code, picking the next node with
+    ``children[idx, value]`` instead of branching on the attribute value.
+    """
+
+    if not len(arrays.label):
+        raise ValueError("Cannot predict with an empty tree")
+    return _predict_rows(arrays.feature, arrays.children, arrays.label, samples)
+
+
+def accuracy(arrays: TreeArrays, samples: np.ndarray, targets: np.ndarray) -> float:
+    """Return the percentage of ``samples`` whose prediction equals ``targets``."""
+
+    return float(np.mean(predict(arrays, samples) == targets)) * 100
+
+
+def node_class_counts(
+    arrays: TreeArrays, samples: np.ndarray, targets: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return how many negative and positive ``samples`` reach every node."""
+
+    size = len(arrays.label)
+    negatives = np.zeros(size, dtype=np.int64)
+    positives = np.zeros(size, dtype=np.int64)
+    if size:
+        _count_rows(
+            arrays.feature,
+            arrays.children,
+            arrays.label,
+            samples,
+            targets,
+            negatives,
+            positives,
+        )
+    return negatives, positives
@@ -2,17 +2,17 @@
 
 from __future__ import annotations
 
-import copy
-import random
 from dataclasses import dataclass
-from typing import List, Sequence
+from typing import Tuple
 
-import pandas as pd
+import numpy as np
+from numba import njit
 
-from . import tree
+from . import bitset, data, pruning, split, tree
 
 
-TARGET_COLUMN = "Class"
+# Variance needs no lookup table; passed where the split search expects one.
+_NO_TABLE = np.zeros(0)
 
 
 @dataclass
@@ -25,6 +25,7 @@ class VarianceRunResult:
     accuracy_after_pruning: float
 
 
+@njit(cache=True)
 def variance_impurity(positive_count: int, negative_count: int) -> float:
     """Return the variance impurity for the supplied class counts."""
 
@@ -38,132 +39,202 @@ def variance_impurity(positive_count: int, negative_count: int) -> float:
     return probability_pos * probability_neg
 
 
+@njit(cache=True)
+def _attribute_gain(
+    total_variance: float,
+    table: np.ndarray,
+    positives: int,
+    negatives: int,
+    ones: int,
+    positive_1: int,
+) -> float:
+    """Return the variance gain of a split given its contingency counts.
+
+    ``ones`` is the number of active rows where the attribute is 1 and
+    ``positive_1`` how many of those rows are positive. ``table`` is unused;
+    it keeps the signature expected by :func:`split.compile_search`.
+    """
+
+    total = positives + negatives
+    negative_1 = ones - positive_1
+    positive_0 = positives - positive_1
+    negative_0 = negatives - negative_1
+    return total_variance - (
+        ((negative_0 + positive_0) / total) * variance_impurity(positive_0, negative_0)
+        + ((negative_1 + positive_1) / total) * variance_impurity(positive_1, negative_1)
+    )
+
+
+@njit(cache=True)
+def _gain_bound(
+    total_variance: float, table: np.ndarray, positives: int, negatives: int, ones: int
+) -> float:
+    """Return the largest variance gain any split with ``ones`` rows at 1 can reach.
+
+    The gain equals d**2 / (w0 * w1), where w0/w1 are the branch weights and
+    d the shift of positive mass between the branches; d is largest when one
+    branch is as pure as its size allows.
+    """
+
+    total = positives + negatives
+    zeroes = total - ones
+    if ones == 0 or zeroes == 0:
+        return 0.0
+    shift = max(
+        min(ones * negatives, zeroes * positives),
+        min(ones * positives, zeroes * negatives),
+    )
+    return (shift / total) ** 2 / (ones * zeroes)
+
+
+_SEARCH = split.compile_search("variance_gains", _gain_bound, _attribute_gain)
+
+
 def _variance_gain(
-    total_variance: float, dataset: pd.DataFrame, attributes: Sequence[str]
-) -> str:
-    """Return the attribute that maximises variance gain."""
-
-    gains: List[float] = []
-    for attribute in attributes:
-        subtotal = 0.0
-        for value in (0, 1):
-            subset = dataset.loc[dataset[attribute] == value]
-            negative = len(subset.loc[subset[TARGET_COLUMN] == 0])
-            positive = len(subset.loc[subset[TARGET_COLUMN] == 1])
-            impurity = variance_impurity(positive, negative)
-            subtotal += ((negative + positive) / len(dataset)) * impurity
-        gains.append(total_variance - subtotal)
-    max_index = gains.index(max(gains))
-    return attributes[max_index]
+    total_variance: float,
+    columns: np.ndarray,
+    target: np.ndarray,
+    active: np.ndarray,
+    attribute_mask: np.ndarray,
+    positives: int,
+    negatives: int,
+) -> Tuple[int, split.BranchCounts]:
+    """Return the attribute that maximises variance gain and its branch counts."""
+
+    return split.best_split(
+        _SEARCH,
+        total_variance,
+        _NO_TABLE,
+        columns,
+        target,
+        active,
+        attribute_mask,
+        positives,
+        negatives,
+    )
 
 
 def _create_node(
     decision_tree: tree.BTree,
-    parent_idx: int | None,
+    parent_node: tree.Node | None,
     branch_value: int | None,
-    value: str,
+    feature: int,
+    label: int,
     zeroes: int,
     ones: int,
-) -> int:
-    if parent_idx is None:
+) -> tree.Node:
+    if parent_node is None:
         if decision_tree.get_root() is None:
-            return decision_tree.add_root(value, zeroes, ones)
+            return decision_tree.add_root(feature, label, zeroes, ones)
         raise ValueError("Root already exists")
     if branch_value == 0:
-        return decision_tree.add_left_child(parent_idx, value, zeroes, ones)
+        return decision_tree.add_left_child(parent_node, feature, label, zeroes, ones)
     if branch_value == 1:
-        return decision_tree.add_right_child(parent_idx, value, zeroes, ones)
+        return decision_tree.add_right_child(parent_node, feature, label, zeroes, ones)
     raise ValueError("Branch value must be 0 or 1 for non-root nodes")
 
 
 def _build_tree(
-    dataset: pd.DataFrame,
-    attributes: Sequence[str],
+    columns: np.ndarray,
+    target: np.ndarray,
+    active: np.ndarray,
+    zeroes: int,
+    ones: int,
+    attribute_mask: np.ndarray,
     decision_tree: tree.BTree,
-    parent_idx: int | None = None,
+    parent_node: tree.Node | None = None,
     branch_value: int | None = None,
 ) -> None:
-    ones = len(dataset.loc[dataset[TARGET_COLUMN] == 1])
-    zeroes = len(dataset.loc[dataset[TARGET_COLUMN] == 0])
-
     if ones == 0:
-        _create_node(decision_tree, parent_idx, branch_value, "0", zeroes, ones)
+        _create_node(decision_tree, parent_node, branch_value, -1, 0, zeroes, ones)
         return
     if zeroes == 0:
-        _create_node(decision_tree, parent_idx, branch_value, "1", zeroes, ones)
+        _create_node(decision_tree, parent_node, branch_value, -1, 1, zeroes, ones)
         return
-    if not attributes:
-        label = "1" if ones >= zeroes else "0"
-        _create_node(decision_tree, parent_idx, branch_value, label, zeroes, ones)
+    if not attribute_mask.any():
+        label = 1 if ones >= zeroes else 0
+        _create_node(decision_tree, parent_node, branch_value, -1, label, zeroes, ones)
         return
 
     total_variance = variance_impurity(ones, zeroes)
-    best_attribute = _variance_gain(total_variance, dataset, attributes)
+    best_column, branch_counts = _variance_gain(
+        total_variance, columns, target, active, attribute_mask, ones, zeroes
+    )
 
-    current_idx = _create_node(
-        decision_tree, parent_idx, branch_value, best_attribute, zeroes, ones
+    current_node = _create_node(
+        decision_tree, parent_node, branch_value, best_column, -1, zeroes, ones
     )
 
-    remaining_attributes = [attribute for attribute in attributes if attribute != best_attribute]
-    for value in (0, 1):
-        subset = dataset.loc[dataset[best_attribute] == value]
-        if subset.empty:
-            label = "1" if ones >= zeroes else "0"
-            _create_node(decision_tree, current_idx, value, label, zeroes, ones)
+    attribute_mask[best_column] = False
+    branches = (
+        (0, active & ~columns[best_column]),
+        (1, active & columns[best_column]),
+    )
+    for (value, subset), (branch_zeroes, branch_ones) in zip(branches, branch_counts):
+        if branch_zeroes + branch_ones == 0:
+            label = 1 if ones >= zeroes else 0
+            _create_node(decision_tree, current_node, value, -1, label, zeroes, ones)
         else:
-            _build_tree(subset, remaining_attributes, decision_tree, current_idx, value)
-
-
-def construct_tree(dataset: pd.DataFrame) -> tree.BTree:
+            _build_tree(
+                columns,
+                target,
+                subset,
+                branch_zeroes,
+                branch_ones,
+                attribute_mask,
+                decision_tree,
+                current_node,
+                value,
+            )
+    attribute_mask[best_column] = True
+
+
+def construct_tree(dataset: data.Dataset) -> tree.BTree:
     """Train an ID3 decision tree using variance impurity as the split criterion."""
 
-    attributes = list(dataset.drop(columns=[TARGET_COLUMN]).columns)
-    decision_tree = tree.BTree()
-    _build_tree(dataset, attributes, decision_tree)
+    attributes = dataset.feature_names
+    columns = bitset.pack_columns(dataset.features)
+    target = bitset.pack(dataset.target)
+    active = bitset.full(len(dataset.target))
+    attribute_mask = np.ones(len(attributes), dtype=bool)
+    ones = int(np.count_nonzero(dataset.target))
+    zeroes = len(dataset.target) - ones
+    decision_tree = tree.BTree(attributes)
+    _build_tree(columns, target, active, zeroes, ones, attribute_mask, decision_tree)
     return decision_tree
 
 
-def calculate_accuracy(dataset: pd.DataFrame, decision_tree: tree.BTree) -> float:
+def calculate_accuracy(dataset: data.Dataset, decision_tree: tree.BTree) -> float:
     """Return the classification accuracy of ``decision_tree`` on ``dataset``."""
 
-    predictors = dataset.drop(columns=[TARGET_COLUMN])
-    root = decision_tree.get_root()
-    if root is None:
+    if decision_tree.get_root() is None:
         raise ValueError("Decision tree has no root node")
-
-    matches = 0
-    for index, row in predictors.iterrows():
-        prediction = decision_tree.traverse(root, row)
-        if prediction == dataset[TARGET_COLUMN].iloc[index]:
-            matches += 1
-    return (matches / len(dataset)) * 100
+    samples = dataset.features_for(decision_tree.feature_names)
+    return tree.accuracy(decision_tree.to_arrays(), samples, dataset.target)
 
 
 def post_pruning(
     l: int,
     k: int,
-    validation: pd.DataFrame,
+    validation: data.Dataset,
     base_tree: tree.BTree,
     print_tree: bool = False,
+    jobs: int = 1,
+    seed: int | None = None,
 ) -> tree.BTree:
     """Apply randomized post-pruning to a variance based decision tree."""
 
-    best_tree = copy.deepcopy(base_tree)
-    current_best = calculate_accuracy(validation, best_tree)
-    for _ in range(max(l, 1)):
-        candidate = copy.deepcopy(base_tree)
-        for _ in range(max(random.randint(1, max(k, 1)), 1)):
-            non_leaves = candidate.get_non_leaves()
-            if not non_leaves:
-                break
-            node_to_prune = random.choice(non_leaves)
-            node_to_prune.left = None
-            node_to_prune.right = None
-            node_to_prune.value = "1" if node_to_prune.ones >= node_to_prune.zeroes else "0"
-        candidate_accuracy = calculate_accuracy(validation, candidate)
-        if candidate_accuracy > current_best:
-            best_tree = candidate
-            current_best = candidate_accuracy
+    samples = validation.features_for(base_tree.feature_names)
+    best_arrays = pruning.random_pruning(
+        base_tree.to_arrays(),
+        l,
+        k,
+        np.random.SeedSequence(seed),
+        samples,
+        validation.target,
+        jobs,
+    )
+    best_tree = tree.BTree.from_arrays(best_arrays, base_tree.feature_names)
     if print_tree:
         print("Pruned variance tree:")
         best_tree.print_btree()
@@ -177,12 +248,14 @@ def run_variance(
     l: int,
     k: int,
     print_tree: bool = False,
+    jobs: int = 1,
+    seed: int | None = None,
 ) -> VarianceRunResult:
     """Train, prune, and evaluate a variance impurity based ID3 tree."""
 
-    training = pd.read_csv(training_path)
-    validation = pd.read_csv(validation_path)
-    test = pd.read_csv(test_path)
+    training = data.load_csv(training_path)
+    validation = data.load_csv(validation_path)
+    test = data.load_csv(test_path)
 
     decision_tree = construct_tree(training)
     if print_tree:
@@ -190,7 +263,9 @@ def run_variance(
         decision_tree.print_btree()
 
     accuracy_before = calculate_accuracy(test, decision_tree)
-    pruned_tree = post_pruning(l, k, validation, decision_tree, print_tree)
+    pruned_tree = post_pruning(
+        l, k, validation, decision_tree, print_tree, jobs, seed
+    )
     accuracy_after = calculate_accuracy(test, pruned_tree)
 
     return VarianceRunResult(